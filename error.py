@@ -1,8 +1,12 @@
+from decimal import Decimal
+
+LAMPORTS_PER_SOL = 1_000_000_000
+
 def get_solana_balance_safe(client, public_key):
     try:
         balance = client.get_balance(public_key)
         lamports = balance['result']['value']
-        sol_balance = lamports / 10**9
+        sol_balance = lamports / LAMPORTS_PER_SOL
         return f"Your Solana balance is: {sol_balance:.9f} SOL"
     except Exception as e:
         return f"Error fetching Solana balance: {str(e)}"
@@ -19,7 +23,7 @@ def send_solana_transaction_safe(client, sender_keypair, recipient_public_key, a
                 TransferParams(
                     from_pubkey=sender_keypair.public_key,
                     to_pubkey=recipient_public_key,
-                    lamports=int(amount * 10**9)
+                    lamports=int((Decimal(str(amount)) * LAMPORTS_PER_SOL).to_integral_value())
                 )
             )
         )
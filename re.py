@@ -1,9 +1,11 @@
 import re
 
+_SEND_RE = re.compile(r"send solana (\d+(?:\.\d+)?) to (\S+)")
+
 def parse_solana_transaction_command(user_input):
-    match = re.search(r"send solana (\d+(\.\d+)?) to (\S+)", user_input.lower())
+    match = _SEND_RE.search(user_input.lower())
     if match:
         amount = float(match.group(1))
-        recipient_address = match.group(3)
+        recipient_address = match.group(2)
         return amount, recipient_address
     return None, None
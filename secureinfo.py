@@ -1,6 +1,13 @@
+import os
 from dotenv import load_dotenv
 
+_env_cache = None
+
 def load_env_vars():
+    global _env_cache
+    if _env_cache is not None:
+        return _env_cache
+
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
     solana_rpc_url = os.getenv("SOLANA_RPC_URL")
@@ -10,4 +17,10 @@ def load_env_vars():
     if not all([openai_api_key, solana_rpc_url, solana_private_key, solana_public_key]):
         raise ValueError("Missing one or more required environment variables.")
     
-    return openai_api_key, solana_rpc_url, solana_private_key, solana_public_key
+    _env_cache = (openai_api_key, solana_rpc_url, solana_private_key, solana_public_key)
+    return _env_cache
+
+def refresh_env_cache():
+    global _env_cache
+    _env_cache = None
+    return load_env_vars()
@@ -1,14 +1,28 @@
 import os
 import asyncio
-import json
+import atexit
 import logging
+import mmap
 import base64
 import csv
+import functools
+import hashlib
+import re
+import socket
+import threading
+import time
+import zlib
 import aiohttp
+import aiohttp.resolver
+import orjson
 import pyotp
 import base58  # Added missing import
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
 from getpass import getpass
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from dotenv import load_dotenv
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
@@ -16,18 +30,31 @@ from solana.rpc.types import TxOpts
 from solana.publickey import PublicKey
 from solana.keypair import Keypair
 from solana.transaction import Transaction
-from solana.system_program import TransferParams, transfer
-from solana.rpc.core import RPCException
+from solana.system_program import SYS_PROGRAM_ID, TransferParams, transfer
+from solana.rpc.core import RPCException, TransactionExpiredBlockheightExceededError
+from solana.exceptions import SolanaRpcException
 from spl.token.constants import TOKEN_PROGRAM_ID
 from spl.token.instructions import transfer_checked, TransferCheckedParams
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import openai
 from rich.console import Console
 from rich.table import Table
+from rich.live import Live
 from rich.prompt import Prompt
 
+try:
+    import based58  # Rust-backed base58; much faster than the pure-Python package when installed
+except ImportError:
+    based58 = None
+
+try:
+    import aiodns  # Enables aiohttp's AsyncResolver: DNS on the event loop instead of a getaddrinfo thread
+except ImportError:
+    aiodns = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+log = logging.getLogger("spica")
 
 # Load environment variables
 load_dotenv()
@@ -37,30 +64,114 @@ console = Console()
 
 # Constants
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
+# Optional comma-separated list of RPC endpoints to race at startup
+SOLANA_RPC_CANDIDATES = [url.strip() for url in os.getenv("SOLANA_RPC_CANDIDATES", "").split(",") if url.strip()]
+# Bulk mode: print bare transaction IDs instead of rich-formatted success lines
+QUIET = os.getenv("SPICA_QUIET") == "1"
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY") or Fernet.generate_key().decode()
-CACHE_FILE = "response_cache.json"
+# Saving private keys to disk is opt-in, and only allowed with a key that survives restarts;
+# a generated key would make the file unreadable
+PERSIST_WALLETS = os.getenv("SPICA_PERSIST_WALLETS") == "1" and bool(os.getenv("ENCRYPTION_KEY"))
+WALLET_FILE = "wallets.enc"
+LAMPORTS_PER_SOL = 1_000_000_000
+CACHE_FILE = "response_cache.jsonl"
+CACHE_MAX_ENTRIES = 10_000
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+CACHE_FLUSH_INTERVAL = 2  # seconds
+CACHE_MMAP_THRESHOLD = 64 * 1024  # bytes; below this mmap setup costs more than it saves
+# Some RPC providers bill each entry of a batched request separately
+RPC_BATCHING = os.getenv("SPICA_RPC_BATCHING", "1") != "0"
+MULTIPLE_ACCOUNTS_CHUNK = 100  # getMultipleAccounts accepts at most 100 keys
+RPC_CONCURRENCY = int(os.getenv("SPICA_RPC_CONCURRENCY", "8"))
+SEND_CONCURRENCY = int(os.getenv("SPICA_SEND_CONCURRENCY", "8"))
+RPC_MAX_RETRIES = 3
+# JSON-RPC error codes providers use for rate limiting when it isn't surfaced as an HTTP 429
+RATE_LIMIT_RPC_CODES = {429, -32429}
+# Skip AAAA lookups and happy-eyeballs fallback on networks where IPv6 is slow or broken
+FORCE_IPV4 = os.getenv("SPICA_FORCE_IPV4") == "1"
+SOL_PRICE_TTL = 15  # seconds
+SIGNATURES_TTL = 5  # seconds
+SIGNATURES_PAGE_LIMIT = 1000  # getSignaturesForAddress returns at most 1000 per call
+BLOCKHASH_TTL = 5  # seconds; well inside the ~60s a blockhash stays valid
+BLOCKHASH_RETRY_DELAY = 0.4  # seconds; roughly one slot, after which a new blockhash is out
 
 # Initialize encryption
 fernet = Fernet(ENCRYPTION_KEY.encode())
 
-# Load or initialize cache
+# Load or initialize cache (append-only log of [key, compressed response, timestamp] records, LRU order)
+response_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+cache_log_records = 0
+# Records written since the last flush; the background flusher appends them in one write
+pending_cache_records: List[bytes] = []
+cache_flush_task: Optional[asyncio.Task] = None
+cache_write_lock = threading.Lock()
 if os.path.exists(CACHE_FILE):
-    try:
-        with open(CACHE_FILE, "r") as f:
-            response_cache = json.load(f)
-    except json.JSONDecodeError:
-        console.print("[yellow]Cache file is corrupted. Initializing empty cache.[/yellow]")
-        response_cache = {}
-else:
-    response_cache = {}
+    cache_cutoff = time.time() - CACHE_TTL
+    with open(CACHE_FILE, "rb") as f:
+        # Large logs are scanned straight out of the page cache instead of through the buffered reader
+        if os.fstat(f.fileno()).st_size >= CACHE_MMAP_THRESHOLD:
+            cache_source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            cache_source = f
+        line = b""
+        for line in iter(cache_source.readline, b""):
+            cache_log_records += 1
+            try:
+                key, response, timestamp = orjson.loads(line)
+            except (ValueError, TypeError):
+                # Torn record from an interrupted append; the next compaction drops it
+                continue
+            if timestamp < cache_cutoff:
+                response_cache.pop(key, None)
+                continue
+            response_cache[key] = (response, timestamp)
+            response_cache.move_to_end(key)
+        if cache_source is not f:
+            cache_source.close()
+    if line and not line.endswith(b"\n"):
+        # Terminate a torn tail so the next append starts on its own line instead of being glued onto it
+        with open(CACHE_FILE, "ab") as f:
+            f.write(b"\n")
+    while len(response_cache) > CACHE_MAX_ENTRIES:
+        response_cache.popitem(last=False)
 
 # Wallet management
-wallets: Dict[str, Keypair] = {}
+@dataclass(slots=True)
+class WalletEntry:
+    keypair: Keypair
+    pubkey_str: str
+    pubkey: PublicKey
+    label: str
+
+wallets: Dict[str, WalletEntry] = {}
+# Public key last written to the wallet file per name, so reconnecting a wallet doesn't re-append it
+saved_wallets: Dict[str, str] = {}
 current_wallet: Optional[str] = None
 
+# Dedicated pool for signing so it doesn't contend with aiohttp's default executor (DNS)
+crypto_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="spica-crypto")
+atexit.register(crypto_executor.shutdown, wait=False)
+
+# SOL transfer message templates per sender: (message, recipient offset, lamports offset, blockhash offset)
+transfer_templates: Dict[str, Tuple[bytes, int, int, int]] = {}
+
 # Solana client
 solana_client = AsyncClient(SOLANA_RPC_URL)
+rpc_semaphore = asyncio.Semaphore(RPC_CONCURRENCY)
+# Separate pool for sends: each holds its slot through confirmation polling, which mustn't starve reads
+send_semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+
+# Short-lived caches for data that changes slower than the UI refreshes
+sol_price_cache = {"ts": 0.0, "usd": None}
+signatures_cache: Dict[Tuple[str, int], Tuple[float, List[dict]]] = {}
+# "transfers" holds the (sender, recipient, mint, amount) keys already signed against the cached blockhash
+blockhash_cache = {"ts": 0.0, "blockhash": None, "last_valid_block_height": None, "transfers": set()}
+blockhash_lock = asyncio.Lock()
+
+# Shared HTTP session for non-RPC endpoints, created lazily inside the event loop
+http_session: Optional[aiohttp.ClientSession] = None
 
 # OpenAI setup
 openai.api_key = OPENAI_API_KEY
@@ -69,42 +180,254 @@ openai.api_key = OPENAI_API_KEY
 totp = pyotp.TOTP(pyotp.random_base32())
 
 # Helper Functions
+def encrypt_bytes(data: bytes) -> bytes:
+    return fernet.encrypt(data)
+
+def decrypt_bytes(token: bytes) -> bytes:
+    return fernet.decrypt(token)
+
 def encrypt_data(data: str) -> str:
-    return fernet.encrypt(data.encode()).decode()
+    return encrypt_bytes(data.encode()).decode()
 
 def decrypt_data(encrypted_data: str) -> str:
-    return fernet.decrypt(encrypted_data.encode()).decode()
+    return decrypt_bytes(encrypted_data.encode()).decode()
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+def cache_key(prompt: str) -> str:
+    # Fixed-width digest of the whitespace-normalised prompt keeps keys small and hit rates up
+    normalized = WHITESPACE_RE.sub(" ", prompt).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+def append_cache_record(key: str, response: str, timestamp: float):
+    pending_cache_records.append(orjson.dumps([key, response, timestamp]) + b"\n")
+
+def write_cache_records(records: List[bytes], replace: bool):
+    # Runs off the event loop; the lock keeps a background write and the exit flush from interleaving
+    with cache_write_lock:
+        if replace:
+            # Full rewrite to a temp file, then an atomic rename so a crash never leaves a half-written cache
+            tmp_file = CACHE_FILE + ".tmp"
+            with open(tmp_file, "wb") as f:
+                f.writelines(records)
+            os.replace(tmp_file, CACHE_FILE)
+        else:
+            with open(CACHE_FILE, "ab") as f:
+                f.writelines(records)
 
-def save_cache():
-    with open(CACHE_FILE, "w") as f:
-        json.dump(response_cache, f)
+def take_cache_writes() -> Optional[Tuple[List[bytes], bool]]:
+    # Swap out the pending records on the caller's thread so new ones keep accumulating during the write
+    global pending_cache_records, cache_log_records
+    if not pending_cache_records:
+        return None
+    records, pending_cache_records = pending_cache_records, []
+    # Compact once superseded and evicted records outnumber the live ones
+    if cache_log_records + len(records) > 2 * len(response_cache) + 100:
+        cache_log_records = len(response_cache)
+        return [
+            orjson.dumps([key, response, timestamp]) + b"\n"
+            for key, (response, timestamp) in response_cache.items()
+        ], True
+    cache_log_records += len(records)
+    return records, False
+
+def flush_cache():
+    writes = take_cache_writes()
+    if writes is not None:
+        write_cache_records(*writes)
+
+async def cache_flusher():
+    while True:
+        await asyncio.sleep(CACHE_FLUSH_INTERVAL)
+        writes = take_cache_writes()
+        if writes is not None:
+            await asyncio.to_thread(write_cache_records, *writes)
+
+def start_cache_flusher():
+    global cache_flush_task
+    if cache_flush_task is None or cache_flush_task.done():
+        cache_flush_task = asyncio.get_running_loop().create_task(cache_flusher())
+
+# Whatever the flusher hasn't written yet goes out at interpreter exit
+atexit.register(flush_cache)
+
+def b58decode(value: str) -> bytes:
+    if based58 is not None:
+        return based58.b58decode(value.encode())
+    return base58.b58decode(value)
+
+BASE58_ADDRESS_RE = re.compile(r"[1-9A-HJ-NP-Za-km-z]{32,44}")
 
 def validate_solana_address(address: str) -> bool:
-    return len(address) == 44
+    # Alphabet/length screen only, done in C by the regex engine; cheap enough for bulk imports
+    return BASE58_ADDRESS_RE.fullmatch(address) is not None
 
-def validate_transaction_amount(amount: str) -> bool:
+@functools.lru_cache(maxsize=1024)
+def validate_solana_address_strict(address: str) -> bool:
+    # Also confirm the address decodes to a 32-byte key; used for recipients we're about to send to
+    if not validate_solana_address(address):
+        return False
     try:
-        return float(amount) > 0
+        return len(b58decode(address)) == 32
     except ValueError:
         return False
 
+AMOUNT_RE = re.compile(r"(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?")
+
+def validate_transaction_amount(amount: str) -> bool:
+    # Shape check in the regex engine instead of float()-and-catch; also rules out signs, inf and nan
+    amount = amount.strip()
+    if AMOUNT_RE.fullmatch(amount) is None:
+        return False
+    value = float(amount)
+    return 0 < value < float("inf")
+
+@functools.lru_cache(maxsize=4096)
+def parse_pubkey(address: str) -> PublicKey:
+    # Repeat sends to the same recipient or mint skip the base58 decode
+    return PublicKey(address)
+
+def to_base_units(amount: float, decimals: int = 9) -> int:
+    # Go through Decimal so fractional amounts like 0.1 SOL don't lose a lamport to float rounding
+    return int((Decimal(str(amount)) * 10**decimals).to_integral_value())
+
 def verify_2fa(code: str) -> bool:
     return totp.verify(code)
 
+async def get_http_session() -> aiohttp.ClientSession:
+    global http_session
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=32,
+            keepalive_timeout=75,
+            resolver=aiohttp.resolver.AsyncResolver() if aiodns is not None else None,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            family=socket.AF_INET if FORCE_IPV4 else 0,
+        )
+        http_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=15))
+    return http_session
+
+def is_rate_limited(error: Optional[BaseException]) -> bool:
+    # solana-py wraps the HTTP error from raise_for_status in SolanaRpcException, so follow the cause chain
+    while error is not None:
+        if getattr(getattr(error, "response", None), "status_code", None) == 429:
+            return True
+        error = error.__cause__
+    return False
+
+async def rpc_call(method, *args, **kwargs):
+    # Bound in-flight RPC requests and back off on rate limits while holding the slot.
+    # solana-py returns JSON-RPC errors as an {"error": ...} body instead of raising; those become RPCException here.
+    async with rpc_semaphore:
+        for attempt in range(RPC_MAX_RETRIES + 1):
+            try:
+                response = await method(*args, **kwargs)
+            except Exception as e:
+                if attempt == RPC_MAX_RETRIES or not is_rate_limited(e):
+                    raise
+            else:
+                error = response.get("error")
+                if error is None:
+                    return response
+                if attempt == RPC_MAX_RETRIES or error.get("code") not in RATE_LIMIT_RPC_CODES:
+                    raise RPCException(error)
+            await asyncio.sleep(0.5 * 2**attempt)
+
+async def rpc_batch(calls: List[Tuple[str, list]]) -> list:
+    # One JSON-RPC array POST for several reads; failed entries come back as RPCException instances
+    payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params} for i, (method, params) in enumerate(calls)]
+    session = await get_http_session()
+    async with rpc_semaphore:
+        async with session.post(SOLANA_RPC_URL, data=orjson.dumps(payload), headers={"Content-Type": "application/json"}) as response:
+            replies = await response.json(loads=orjson.loads)
+    if not isinstance(replies, list):
+        raise RPCException(replies.get("error", replies))
+
+    # Replies may arrive in any order; match them back up by id
+    by_id = {reply.get("id"): reply for reply in replies}
+    results = []
+    for i in range(len(calls)):
+        reply = by_id.get(i)
+        if reply is None:
+            results.append(RPCException(f"No reply for {calls[i][0]} in batch"))
+        elif "error" in reply:
+            results.append(RPCException(reply["error"]))
+        else:
+            results.append(reply["result"])
+    return results
+
+async def run_crypto(func, *args):
+    # ed25519 signing and key derivation are CPU-bound; keep them off the event loop
+    return await asyncio.get_running_loop().run_in_executor(crypto_executor, func, *args)
+
+async def close_http_session():
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+
+async def shutdown():
+    # Persist pending cache records and release pooled connections before the event loop closes.
+    # The cache flush and executor shutdown also run at exit, but the HTTP session and RPC client
+    # can only be closed from the loop: async callers should `await shutdown()` before it exits.
+    if cache_flush_task is not None:
+        cache_flush_task.cancel()
+    flush_cache()
+    await close_http_session()
+    await solana_client.close()
+    crypto_executor.shutdown(wait=False)
+
 # Wallet Management
+def register_wallet(wallet_name: str, keypair: Keypair):
+    wallets[wallet_name] = WalletEntry(
+        keypair=keypair, pubkey_str=str(keypair.public_key), pubkey=keypair.public_key, label=wallet_name
+    )
+
+def iter_wallets():
+    return iter(wallets.values())
+
+def save_wallet(wallet_name: str, secret_key: bytes):
+    # One "name<TAB>fernet token" line per wallet; owner-only permissions since it holds key material
+    fd = os.open(WALLET_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    with os.fdopen(fd, "ab") as f:
+        f.write(wallet_name.encode() + b"\t" + encrypt_bytes(secret_key) + b"\n")
+    saved_wallets[wallet_name] = str(Keypair.from_secret_key(secret_key).public_key)
+
+def load_saved_wallets():
+    if not os.path.exists(WALLET_FILE):
+        return
+    with open(WALLET_FILE, "rb") as f:
+        records = [line.rstrip(b"\n").rpartition(b"\t") for line in f if line.strip()]
+    for name, _, token in records:
+        try:
+            keypair = Keypair.from_secret_key(decrypt_bytes(token))
+        except InvalidToken:
+            console.print(f"[yellow]Skipping saved wallet '{name.decode()}': wrong ENCRYPTION_KEY.[/yellow]")
+            continue
+        except ValueError:
+            console.print(f"[yellow]Skipping saved wallet '{name.decode()}': malformed secret key.[/yellow]")
+            continue
+        register_wallet(name.decode(), keypair)
+        saved_wallets[name.decode()] = str(keypair.public_key)
+
 def connect_wallet(wallet_name: str, private_key: Optional[str] = None):
     if not private_key:
         private_key = getpass("Enter your private key (base58 encoded): ")
     try:
-        decoded_key = base58.b58decode(private_key)
+        decoded_key = b58decode(private_key)
         if len(decoded_key) != 64:
             raise ValueError("Invalid private key length.")
         keypair = Keypair.from_secret_key(decoded_key)
-        wallets[wallet_name] = keypair
+        register_wallet(wallet_name, keypair)
+        if PERSIST_WALLETS and saved_wallets.get(wallet_name) != str(keypair.public_key):
+            save_wallet(wallet_name, decoded_key)
         console.print(f"[green]Wallet '{wallet_name}' connected: {keypair.public_key}[/green]")
     except Exception as e:
         console.print(f"[red]Failed to connect wallet: {e}[/red]")
 
+if PERSIST_WALLETS:
+    load_saved_wallets()
+
 def switch_wallet(new_wallet: str) -> Optional[str]:
     global current_wallet
     if new_wallet in wallets:
@@ -116,14 +439,47 @@ def switch_wallet(new_wallet: str) -> Optional[str]:
         return current_wallet
 
 # Solana Functions
+async def select_rpc_endpoint(candidates: Optional[List[str]] = None) -> str:
+    # One-shot latency race: keep whichever endpoint first answers getLatestBlockhash successfully
+    global solana_client, SOLANA_RPC_URL
+    candidates = candidates or SOLANA_RPC_CANDIDATES
+    if not candidates:
+        return SOLANA_RPC_URL
+
+    clients = {url: AsyncClient(url) for url in candidates}
+    probes = {asyncio.ensure_future(client.get_latest_blockhash()): url for url, client in clients.items()}
+    pending = set(probes)
+    fastest = None
+    while pending and fastest is None:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for probe in done:
+            # A quick JSON-RPC error body (HTTP 200) doesn't make an endpoint usable
+            if not probe.cancelled() and probe.exception() is None and "result" in probe.result():
+                fastest = probes[probe]
+                break
+    for probe in pending:
+        probe.cancel()
+    for url, client in clients.items():
+        if url != fastest:
+            await client.close()
+
+    if fastest is None:
+        console.print("[yellow]No candidate RPC endpoint responded; keeping the current one.[/yellow]")
+        return SOLANA_RPC_URL
+    await solana_client.close()
+    solana_client = clients[fastest]
+    SOLANA_RPC_URL = fastest
+    return fastest
+
 async def get_solana_balance(wallet_name: str) -> Optional[float]:
-    if wallet_name not in wallets:
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
         console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
         return None
     try:
-        balance = await solana_client.get_balance(wallets[wallet_name].public_key, commitment=Confirmed)
+        balance = await rpc_call(solana_client.get_balance, wallet.pubkey, commitment=Confirmed)
         lamports = balance["result"]["value"]
-        return lamports / 10**9
+        return lamports / LAMPORTS_PER_SOL
     except aiohttp.ClientError as e:
         console.print(f"[red]RPC connection error: {e}[/red]")
         return None
@@ -131,12 +487,213 @@ async def get_solana_balance(wallet_name: str) -> Optional[float]:
         console.print(f"[red]Error fetching balance: {e}[/red]")
         return None
 
-async def send_solana_transaction(wallet_name: str, recipient: str, amount: float, token_address: Optional[str] = None, decimals: int = 9):
-    if wallet_name not in wallets:
+async def get_balances_batch(wallet_names: List[str]) -> Dict[str, float]:
+    names = [name for name in wallet_names if name in wallets]
+    if not RPC_BATCHING:
+        results = await asyncio.gather(*(get_solana_balance(name) for name in names))
+        return {name: balance for name, balance in zip(names, results) if balance is not None}
+
+    async def fetch_chunk(chunk: List[str]) -> Dict[str, float]:
+        try:
+            response = await rpc_call(
+                solana_client.get_multiple_accounts,
+                [wallets[name].pubkey for name in chunk],
+                commitment=Confirmed,
+            )
+        except SolanaRpcException as e:
+            # solana-py's wrapper for transport and HTTP errors; it carries its message in error_msg
+            console.print(f"[red]RPC connection error: {e.error_msg}[/red]")
+            return {}
+        except RPCException as e:
+            # JSON-RPC error bodies, raised by rpc_call
+            console.print(f"[red]Error fetching balances: {e}[/red]")
+            return {}
+        # Results come back in request order; unfunded accounts are null
+        return {
+            name: (account["lamports"] if account else 0) / LAMPORTS_PER_SOL
+            for name, account in zip(chunk, response["result"]["value"])
+        }
+
+    chunks = [names[i:i + MULTIPLE_ACCOUNTS_CHUNK] for i in range(0, len(names), MULTIPLE_ACCOUNTS_CHUNK)]
+    balances: Dict[str, float] = {}
+    # One bad chunk only leaves its own wallets without a balance
+    for chunk, result in zip(chunks, await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)):
+        if isinstance(result, Exception):
+            console.print(f"[red]Error fetching balances for {', '.join(chunk)}: {result!r}[/red]")
+            continue
+        balances.update(result)
+    return balances
+
+async def show_portfolio():
+    # All connected wallets in one batched balance lookup instead of a round trip each
+    entries = list(iter_wallets())
+    balances = await get_balances_batch([wallet.label for wallet in entries])
+
+    table = Table(title="Portfolio")
+    table.add_column("Wallet", style="cyan")
+    table.add_column("Address", style="magenta")
+    table.add_column("Balance (SOL)", style="green", justify="right")
+    for wallet in entries:
+        balance = balances.get(wallet.label)
+        table.add_row(wallet.label, wallet.pubkey_str, f"{balance:.9f}" if balance is not None else "?")
+
+    console.print(table)
+
+async def fetch_recent_blockhash(transfer: Optional[tuple] = None) -> Tuple[bytes, int]:
+    # One blockhash serves every send in a burst; the lock keeps concurrent sends from all refetching it.
+    # Signing is deterministic, so a transfer repeated under the same blockhash would serialize to the
+    # already-sent transaction; a repeat waits for the next blockhash instead.
+    async with blockhash_lock:
+        refresh = (
+            blockhash_cache["blockhash"] is None
+            or time.monotonic() - blockhash_cache["ts"] >= BLOCKHASH_TTL
+            or transfer in blockhash_cache["transfers"]
+        )
+        while refresh or transfer in blockhash_cache["transfers"]:
+            if not refresh:
+                await asyncio.sleep(BLOCKHASH_RETRY_DELAY)
+            response = await solana_client.get_latest_blockhash()
+            value = response["result"]["value"]
+            blockhash = b58decode(value["blockhash"])
+            if blockhash != blockhash_cache["blockhash"]:
+                blockhash_cache["blockhash"] = blockhash
+                blockhash_cache["transfers"] = set()
+            blockhash_cache["last_valid_block_height"] = value["lastValidBlockHeight"]
+            blockhash_cache["ts"] = time.monotonic()
+            refresh = False
+        if transfer is not None:
+            blockhash_cache["transfers"].add(transfer)
+        return blockhash_cache["blockhash"], blockhash_cache["last_valid_block_height"]
+
+def invalidate_blockhash():
+    blockhash_cache["blockhash"] = None
+
+# Sentinel values used once per sender to locate the variable fields of a serialized transfer
+TEMPLATE_RECIPIENT = bytes([0xA5] * 32)
+TEMPLATE_BLOCKHASH = bytes([0x5A] * 32)
+TEMPLATE_LAMPORTS = 0x0123456789ABCDEF
+
+def compile_transfer_message(sender_keypair: Keypair, recipient_pubkey: PublicKey, lamports: int, blockhash: bytes) -> bytes:
+    transaction = Transaction(
+        recent_blockhash=base58.b58encode(blockhash).decode(),
+        fee_payer=sender_keypair.public_key,
+    ).add(
+        transfer(
+            TransferParams(
+                from_pubkey=sender_keypair.public_key,
+                to_pubkey=recipient_pubkey,
+                lamports=lamports
+            )
+        )
+    )
+    return transaction.serialize_message()
+
+def build_transfer_message(sender_keypair: Keypair, recipient_pubkey: PublicKey, lamports: int, blockhash: bytes) -> bytes:
+    # Sending to yourself or to the System Program itself dedupes the account list, so the
+    # three-account template doesn't fit; compile those the normal way
+    if bytes(recipient_pubkey) in (bytes(sender_keypair.public_key), bytes(SYS_PROGRAM_ID)):
+        return compile_transfer_message(sender_keypair, recipient_pubkey, lamports, blockhash)
+
+    sender = str(sender_keypair.public_key)
+    template = transfer_templates.get(sender)
+    if template is None:
+        message = compile_transfer_message(
+            sender_keypair, PublicKey(TEMPLATE_RECIPIENT), TEMPLATE_LAMPORTS, TEMPLATE_BLOCKHASH
+        )
+        template = (
+            message,
+            message.index(TEMPLATE_RECIPIENT),
+            message.index(TEMPLATE_LAMPORTS.to_bytes(8, "little")),
+            message.index(TEMPLATE_BLOCKHASH),
+        )
+        transfer_templates[sender] = template
+
+    message, recipient_at, lamports_at, blockhash_at = template
+    patched = bytearray(message)
+    patched[recipient_at:recipient_at + 32] = bytes(recipient_pubkey)
+    patched[lamports_at:lamports_at + 8] = lamports.to_bytes(8, "little")
+    patched[blockhash_at:blockhash_at + 32] = blockhash
+    return bytes(patched)
+
+# Sends go to a single endpoint on purpose: RPC nodes forward transactions to the
+# scheduled leader, so broadcasting to several providers only multiplies bandwidth
+# and handshakes without landing the transaction any sooner. Pick a close endpoint
+# with select_rpc_endpoint() instead.
+async def submit_transfer(sender_keypair: Keypair, recipient: str, amount: float, token_address: Optional[str] = None, decimals: int = 9, trusted: bool = True) -> str:
+    recipient_pubkey = parse_pubkey(recipient)
+    base_units = to_base_units(amount, decimals if token_address else 9)
+    blockhash, last_valid_block_height = await fetch_recent_blockhash(
+        (str(sender_keypair.public_key), str(recipient_pubkey), token_address, base_units)
+    )
+
+    # Both paths sign exactly once here and submit the raw bytes, so the RPC client never re-signs
+    if token_address:
+        # SPL Token Transfer
+        token_pubkey = parse_pubkey(token_address)
+        transaction = Transaction(
+            recent_blockhash=base58.b58encode(blockhash).decode(),
+            fee_payer=sender_keypair.public_key,
+        ).add(
+            transfer_checked(
+                TransferCheckedParams(
+                    program_id=TOKEN_PROGRAM_ID,
+                    source=sender_keypair.public_key,
+                    mint=token_pubkey,
+                    dest=recipient_pubkey,
+                    owner=sender_keypair.public_key,
+                    amount=base_units,  # Use provided decimals
+                    decimals=decimals
+                )
+            )
+        )
+        await run_crypto(transaction.sign, sender_keypair)
+        wire_transaction = transaction.serialize()
+    else:
+        # SOL Transfer: patch the sender's message template rather than rebuilding the transaction
+        message = build_transfer_message(sender_keypair, recipient_pubkey, base_units, blockhash)
+        signature = bytes(await run_crypto(sender_keypair.sign, message))
+        wire_transaction = b"\x01" + signature + message
+
+    # Plain SOL transfers built here are well-formed, so trusted sends skip the server-side simulation.
+    # Token transfers keep preflight: a wrong decimals value would otherwise fail irrecoverably on-chain.
+    skip_preflight = trusted and not token_address
+    # Confirming against the blockhash's last valid height gives up as soon as the transaction
+    # can no longer land, rather than after a fixed timeout
+    opts = TxOpts(
+        skip_preflight=skip_preflight,
+        skip_confirmation=False,
+        preflight_commitment=Confirmed,
+        last_valid_block_height=last_valid_block_height,
+    )
+    try:
+        response = await solana_client.send_raw_transaction(wire_transaction, opts=opts)
+    except RPCException as e:
+        if "blockhash not found" in str(e).lower():
+            invalidate_blockhash()
+        raise
+    except TransactionExpiredBlockheightExceededError:
+        invalidate_blockhash()
+        raise
+    # Lazy %-formatting: the response is only rendered when DEBUG logging is on
+    log.debug("send_raw_transaction response: %r", response)
+
+    tx_id = response["result"]
+    if skip_preflight:
+        # Confirmation only waits for the commitment level; without preflight, an on-chain
+        # failure (e.g. insufficient funds) is only visible in the signature status
+        statuses = await solana_client.get_signature_statuses([tx_id])
+        status = statuses["result"]["value"][0]
+        if status is not None and status.get("err") is not None:
+            raise RPCException(f"Transaction {tx_id} failed on-chain: {status['err']}")
+    return tx_id
+
+async def send_solana_transaction(wallet_name: str, recipient: str, amount: float, token_address: Optional[str] = None, decimals: int = 9, trusted: bool = True):
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
         console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
         return
 
-    if not validate_solana_address(recipient):
+    if not validate_solana_address_strict(recipient):
         console.print("[red]Invalid recipient address.[/red]")
         return
 
@@ -155,107 +712,305 @@ async def send_solana_transaction(wallet_name: str, recipient: str, amount: floa
         return
 
     try:
-        sender_keypair = wallets[wallet_name]
-        recipient_pubkey = PublicKey(recipient)
-
-        if token_address:
-            # SPL Token Transfer
-            token_pubkey = PublicKey(token_address)
-            transaction = Transaction().add(
-                transfer_checked(
-                    TransferCheckedParams(
-                        program_id=TOKEN_PROGRAM_ID,
-                        source=sender_keypair.public_key,
-                        mint=token_pubkey,
-                        dest=recipient_pubkey,
-                        owner=sender_keypair.public_key,
-                        amount=int(amount * 10**decimals),  # Use provided decimals
-                        decimals=decimals
-                    )
-                )
-            )
+        tx_id = await submit_transfer(wallet.keypair, recipient, amount, token_address, decimals, trusted)
+        if QUIET:
+            print(tx_id)
         else:
-            # SOL Transfer
-            transaction = Transaction().add(
-                transfer(
-                    TransferParams(
-                        from_pubkey=sender_keypair.public_key,
-                        to_pubkey=recipient_pubkey,
-                        lamports=int(amount * 10**9)
-                    )
-                )
-            )
-
-        transaction.sign(sender_keypair)
-        response = await solana_client.send_transaction(transaction, sender_keypair, opts=TxOpts(skip_confirmation=False))
-        console.print(f"[green]Transaction successful. Transaction ID: {response['result']}[/green]")
-    except RPCException as e:
+            console.print(f"[green]Transaction successful. Transaction ID: {tx_id}[/green]")
+    except (RPCException, TransactionExpiredBlockheightExceededError) as e:
         console.print(f"[red]Transaction failed: {e}[/red]")
 
+async def send_many(wallet_name: str, transfers: List[Tuple[str, float]], token_address: Optional[str] = None, decimals: int = 9, trusted: bool = True):
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
+        console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
+        return
+
+    for recipient, amount in transfers:
+        if not validate_solana_address_strict(recipient):
+            console.print(f"[red]Invalid recipient address: {recipient}[/red]")
+            return
+        if not validate_transaction_amount(str(amount)):
+            console.print(f"[red]Invalid transaction amount for {recipient}.[/red]")
+            return
+
+    # Sends in a burst share a cached blockhash and signing is deterministic, so two identical
+    # transfers would serialize to the same transaction and only one would ever land
+    seen = set()
+    for recipient, amount in transfers:
+        key = (recipient, to_base_units(amount, decimals if token_address else 9))
+        if key in seen:
+            console.print(f"[red]Duplicate transfer of {amount} to {recipient}; combine them into one.[/red]")
+            return
+        seen.add(key)
+
+    # One confirmation and one 2FA check cover the whole batch
+    total = sum(Decimal(str(amount)) for _, amount in transfers)
+    confirmation = Prompt.ask(f"Are you sure you want to send {total} {'SOL' if not token_address else 'tokens'} across {len(transfers)} transfers? (yes/no)")
+    if confirmation.lower() != "yes":
+        console.print("[yellow]Transactions canceled.[/yellow]")
+        return
+
+    code = Prompt.ask("Enter your 2FA code")
+    if not verify_2fa(code):
+        console.print("[red]Invalid 2FA code. Transactions canceled.[/red]")
+        return
+
+    async def guarded_submit(recipient: str, amount: float) -> str:
+        async with send_semaphore:
+            return await submit_transfer(wallet.keypair, recipient, amount, token_address, decimals, trusted)
+
+    results = await asyncio.gather(
+        *(guarded_submit(recipient, amount) for recipient, amount in transfers),
+        return_exceptions=True,
+    )
+    for (recipient, amount), result in zip(transfers, results):
+        if isinstance(result, Exception):
+            console.print(f"[red]Transfer of {amount} to {recipient} failed: {result}[/red]")
+        elif QUIET:
+            print(result)
+        else:
+            console.print(f"[green]Sent {amount} to {recipient}. Transaction ID: {result}[/green]")
+
+async def fetch_transaction_history(pubkey: PublicKey, limit: int = 5) -> List[dict]:
+    key = (str(pubkey), limit)
+    cached = signatures_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < SIGNATURES_TTL:
+        return cached[1]
+    response = await rpc_call(solana_client.get_signatures_for_address, pubkey, limit=limit)
+    signatures_cache[key] = (time.monotonic(), response["result"])
+    return response["result"]
+
+def render_transaction_history(wallet_name: str, transactions: List[dict]):
+    table = Table(title=f"Transaction History for {wallet_name}")
+    table.add_column("Signature", style="cyan")
+    table.add_column("Slot", style="magenta")
+    table.add_column("Block Time", style="green")
+
+    for tx in transactions:
+        table.add_row(tx["signature"], str(tx["slot"]), str(tx["blockTime"]))
+
+    console.print(table)
+
 async def get_transaction_history(wallet_name: str, limit: int = 5):
-    if wallet_name not in wallets:
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
         console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
         return
 
     try:
-        pubkey = wallets[wallet_name].public_key
-        response = await solana_client.get_signatures_for_address(pubkey, limit=limit)
-        transactions = response["result"]
-
-        table = Table(title=f"Transaction History for {wallet_name}")
-        table.add_column("Signature", style="cyan")
-        table.add_column("Slot", style="magenta")
-        table.add_column("Block Time", style="green")
+        render_transaction_history(wallet_name, await fetch_transaction_history(wallet.pubkey, limit))
+    except RPCException as e:
+        console.print(f"[red]Error fetching transaction history: {e}[/red]")
 
-        for tx in transactions:
-            table.add_row(tx["signature"], str(tx["slot"]), str(tx["blockTime"]))
+async def export_transaction_history(wallet_name: str, path: str, limit: int = 1000):
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
+        console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
+        return
 
-        console.print(table)
+    # Column lists rather than per-row records, so the whole export is one writerows call
+    columns: Dict[str, list] = {"signature": [], "slot": [], "blockTime": []}
+    before = None
+    try:
+        while len(columns["signature"]) < limit:
+            page_size = min(SIGNATURES_PAGE_LIMIT, limit - len(columns["signature"]))
+            response = await rpc_call(solana_client.get_signatures_for_address, wallet.pubkey, before=before, limit=page_size)
+            page = response["result"]
+            for name, values in columns.items():
+                values.extend(tx[name] for tx in page)
+            if len(page) < page_size:
+                break
+            before = page[-1]["signature"]
     except RPCException as e:
         console.print(f"[red]Error fetching transaction history: {e}[/red]")
+        return
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        writer.writerows(zip(*columns.values()))
+    console.print(f"[green]Exported {len(columns['signature'])} transactions to {path}[/green]")
+
+async def iter_nfts(pubkey: PublicKey):
+    # Walk the owner listing page by page so rows can be shown before the whole collection arrives
+    url = "https://api.simplehash.com/api/v0/nfts/owners"
+    params = {"wallet_addresses": str(pubkey)}
+    session = await get_http_session()
+    while True:
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            page = await response.json(loads=orjson.loads)
+        # An error body would otherwise read as an empty collection
+        if not isinstance(page, dict) or "nfts" not in page:
+            raise ValueError(f"Unexpected NFT listing response: {page!r}")
+        for nft in page["nfts"]:
+            yield nft
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return
+        params["cursor"] = cursor
+
+async def fetch_nfts(pubkey: PublicKey) -> List[dict]:
+    return [nft async for nft in iter_nfts(pubkey)]
+
+def new_nft_table(wallet_name: str) -> Table:
+    table = Table(title=f"NFTs for {wallet_name}")
+    table.add_column("Name", style="cyan")
+    table.add_column("Mint Address", style="magenta")
+    table.add_column("Collection", style="green")
+    return table
+
+def add_nft_row(table: Table, nft: dict):
+    name = nft.get("name", "Unknown")
+    mint_address = nft.get("mint_address", "Unknown")
+    collection_name = (nft.get("collection") or {}).get("name", "Unknown")
+    table.add_row(name, mint_address, collection_name)
+
+def render_nfts(wallet_name: str, nfts: List[dict]):
+    table = new_nft_table(wallet_name)
+    for nft in nfts:
+        add_nft_row(table, nft)
+    console.print(table)
 
 async def get_nfts(wallet_name: str):
-    if wallet_name not in wallets:
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
         console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
         return
 
     try:
-        pubkey = wallets[wallet_name].public_key
-        url = f"https://api.simplehash.com/api/v0/nfts/owners?wallet_addresses={pubkey}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                nfts = await response.json()
-
-        table = Table(title=f"NFTs for {wallet_name}")
-        table.add_column("Name", style="cyan")
-        table.add_column("Mint Address", style="magenta")
-        table.add_column("Collection", style="green")
-
-        for nft in nfts:
-            name = nft.get("name", "Unknown")
-            mint_address = nft.get("mint_address", "Unknown")
-            collection_name = nft.get("collection", {}).get("name", "Unknown")
-            table.add_row(name, mint_address, collection_name)
-
-        console.print(table)
+        table = new_nft_table(wallet_name)
+        with Live(table, console=console, refresh_per_second=4):
+            async for nft in iter_nfts(wallet.pubkey):
+                add_nft_row(table, nft)
     except Exception as e:
         console.print(f"[red]Error fetching NFTs: {e}[/red]")
 
+async def fetch_sol_price() -> float:
+    if sol_price_cache["usd"] is not None and time.monotonic() - sol_price_cache["ts"] < SOL_PRICE_TTL:
+        return sol_price_cache["usd"]
+    url = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
+    session = await get_http_session()
+    async with session.get(url) as response:
+        price_data = await response.json(loads=orjson.loads)
+    sol_price_cache["usd"] = price_data["solana"]["usd"]
+    sol_price_cache["ts"] = time.monotonic()
+    return sol_price_cache["usd"]
+
 async def get_sol_price():
     try:
-        url = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                price_data = await response.json()
-                sol_price = price_data["solana"]["usd"]
-                console.print(f"[green]Current SOL price: ${sol_price}[/green]")
+        sol_price = await fetch_sol_price()
+        console.print(f"[green]Current SOL price: ${sol_price}[/green]")
     except Exception as e:
         console.print(f"[red]Error fetching SOL price: {e}[/red]")
 
+async def refresh_wallet_view(wallet_name: str):
+    wallet = wallets.get(wallet_name)
+    if wallet is None:
+        console.print(f"[red]Wallet '{wallet_name}' not found.[/red]")
+        return
+
+    # Balance and signatures share one batched RPC request; it runs alongside the NFT and price lookups
+    pubkey = wallet.pubkey_str
+    rpc_reads, nfts, sol_price = await asyncio.gather(
+        rpc_batch([
+            ("getBalance", [pubkey, {"commitment": "confirmed"}]),
+            ("getSignaturesForAddress", [pubkey, {"limit": 5}]),
+        ]),
+        fetch_nfts(wallet.pubkey),
+        fetch_sol_price(),
+        return_exceptions=True,
+    )
+    balance, transactions = (rpc_reads, rpc_reads) if isinstance(rpc_reads, Exception) else rpc_reads
+
+    if isinstance(sol_price, Exception):
+        console.print(f"[red]Error fetching SOL price: {sol_price}[/red]")
+        sol_price = None
+    if isinstance(balance, Exception):
+        console.print(f"[red]Error fetching balance: {balance}[/red]")
+    else:
+        sol_balance = balance["value"] / LAMPORTS_PER_SOL
+        usd = f" (${sol_balance * sol_price:,.2f})" if sol_price is not None else ""
+        console.print(f"[green]Balance for {wallet_name}: {sol_balance:.9f} SOL{usd}[/green]")
+
+    if isinstance(transactions, Exception):
+        console.print(f"[red]Error fetching transaction history: {transactions}[/red]")
+    else:
+        render_transaction_history(wallet_name, transactions)
+
+    if isinstance(nfts, Exception):
+        console.print(f"[red]Error fetching NFTs: {nfts}[/red]")
+    else:
+        render_nfts(wallet_name, nfts)
+
 # OpenAI Functions
+def compress_response(response: str) -> str:
+    return base64.b64encode(zlib.compress(response.encode(), 6)).decode()
+
+def decompress_response(payload: str) -> str:
+    return zlib.decompress(base64.b64decode(payload)).decode()
+
 def get_cached_response(prompt: str) -> Optional[str]:
-    return response_cache.get(prompt)
+    key = cache_key(prompt)
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    payload, timestamp = entry
+    if time.time() - timestamp > CACHE_TTL:
+        del response_cache[key]
+        return None
+    try:
+        response = decompress_response(payload)
+    except (ValueError, zlib.error):
+        # Record written before responses were compressed; treat as a miss
+        del response_cache[key]
+        return None
+    response_cache.move_to_end(key)
+    return response
 
 def cache_response(prompt: str, response: str):
-    response_cache[prompt] = response
-    save
+    # Responses stay compressed both in memory and in the log; they're only inflated on a hit
+    key = cache_key(prompt)
+    payload = compress_response(response)
+    timestamp = time.time()
+    response_cache[key] = (payload, timestamp)
+    response_cache.move_to_end(key)
+    while len(response_cache) > CACHE_MAX_ENTRIES:
+        response_cache.popitem(last=False)
+    append_cache_record(key, payload, timestamp)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # No loop to run the flusher on; the atexit flush picks the record up
+        return
+    start_cache_flusher()
+
+async def get_openai_response(prompt: str, max_tokens: int = 150) -> Optional[str]:
+    cached = get_cached_response(prompt)
+    if cached is not None:
+        console.print(cached, markup=False, highlight=False)
+        return cached
+
+    # Stream the reply so the first tokens reach the terminal without waiting for the full completion
+    tokens = []
+    try:
+        stream = await openai.ChatCompletion.acreate(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            token = chunk["choices"][0]["delta"].get("content", "")
+            if token:
+                tokens.append(token)
+                console.print(token, end="", markup=False, highlight=False)
+        console.print()
+    except openai.error.OpenAIError as e:
+        console.print(f"[red]OpenAI request failed: {e}[/red]")
+        return None
+
+    response = "".join(tokens)
+    cache_response(prompt, response)
+    return response
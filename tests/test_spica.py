@@ -0,0 +1,352 @@
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+for dependency in ("solana", "spl", "aiohttp", "orjson", "pyotp", "base58", "dotenv", "cryptography", "openai", "rich"):
+    pytest.importorskip(dependency)
+
+# Appended rather than prepended so the repo's re.py doesn't shadow the stdlib module
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import aiohttp
+import base58
+from solana.keypair import Keypair
+from solana.system_program import SYS_PROGRAM_ID
+from solana.transaction import Transaction
+
+BLOCKHASH = "EkSnNWid2cvwEVnVx9aBqawnmiCNiDgp3gUdkDPTKN1N"
+
+
+class StubClient:
+    def __init__(self):
+        self.sent = []
+        self.blockhashes = 0
+
+    async def get_latest_blockhash(self, *args, **kwargs):
+        # BLOCKHASH first, then a new one per call, as if a slot passed between requests
+        blockhash = BLOCKHASH if not self.blockhashes else base58.b58encode(bytes([self.blockhashes]) * 32).decode()
+        self.blockhashes += 1
+        return {"result": {"value": {"blockhash": blockhash, "lastValidBlockHeight": 1_000}}}
+
+    async def send_raw_transaction(self, txn, opts=None):
+        self.sent.append((txn, opts))
+        return {"result": "stub-signature"}
+
+    async def get_signature_statuses(self, signatures, *args, **kwargs):
+        return {"result": {"value": [{"err": None, "confirmationStatus": "confirmed"}]}}
+
+
+@pytest.fixture
+def spica(tmp_path, monkeypatch):
+    # The module loads its response cache from the working directory at import time
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("spica")
+    client = StubClient()
+    monkeypatch.setattr(module, "solana_client", client)
+    monkeypatch.setitem(module.blockhash_cache, "blockhash", None)
+    module.transfer_templates.clear()
+    return module
+
+
+def test_sol_transfer_is_signed_and_serialized(spica):
+    sender = Keypair()
+    recipient = Keypair().public_key
+
+    tx_id = asyncio.run(spica.submit_transfer(sender, str(recipient), 0.25))
+
+    assert tx_id == "stub-signature"
+    (wire_transaction, _), = spica.solana_client.sent
+    transaction = Transaction.deserialize(wire_transaction)
+    assert transaction.verify_signatures()
+    expected = spica.compile_transfer_message(
+        sender, recipient, 250_000_000, spica.b58decode(BLOCKHASH)
+    )
+    assert wire_transaction[1 + 64:] == expected
+
+
+def test_repeated_transfer_is_signed_against_a_new_blockhash(spica):
+    sender = Keypair()
+    recipient = str(Keypair().public_key)
+
+    async def send_twice():
+        await spica.submit_transfer(sender, recipient, 1)
+        await spica.submit_transfer(sender, recipient, 1)
+
+    asyncio.run(send_twice())
+
+    first, second = (wire for wire, _ in spica.solana_client.sent)
+    assert first != second
+    assert spica.solana_client.blockhashes == 2
+
+
+def test_distinct_transfers_share_the_cached_blockhash(spica):
+    sender = Keypair()
+
+    async def send_two():
+        await spica.submit_transfer(sender, str(Keypair().public_key), 1)
+        await spica.submit_transfer(sender, str(Keypair().public_key), 1)
+
+    asyncio.run(send_two())
+
+    assert spica.solana_client.blockhashes == 1
+
+
+def test_template_matches_compiled_message_for_repeat_sender(spica):
+    sender = Keypair()
+    blockhash = spica.b58decode(BLOCKHASH)
+    for recipient in (Keypair().public_key, Keypair().public_key):
+        assert spica.build_transfer_message(sender, recipient, 12_345, blockhash) == spica.compile_transfer_message(
+            sender, recipient, 12_345, blockhash
+        )
+
+
+@pytest.mark.parametrize("recipient_kind", ["self", "system_program"])
+def test_deduped_recipients_bypass_the_template(spica, recipient_kind):
+    sender = Keypair()
+    recipient = sender.public_key if recipient_kind == "self" else SYS_PROGRAM_ID
+    blockhash = spica.b58decode(BLOCKHASH)
+
+    message = spica.build_transfer_message(sender, recipient, 1, blockhash)
+
+    assert message == spica.compile_transfer_message(sender, recipient, 1, blockhash)
+
+
+def test_trusted_send_raises_when_transaction_failed_on_chain(spica, monkeypatch):
+    async def failed_status(signatures, *args, **kwargs):
+        return {"result": {"value": [{"err": {"InstructionError": [0, {"Custom": 1}]}, "confirmationStatus": "confirmed"}]}}
+
+    monkeypatch.setattr(spica.solana_client, "get_signature_statuses", failed_status)
+
+    with pytest.raises(spica.RPCException, match="failed on-chain"):
+        asyncio.run(spica.submit_transfer(Keypair(), str(Keypair().public_key), 1))
+
+
+def test_send_confirms_against_last_valid_block_height(spica):
+    asyncio.run(spica.submit_transfer(Keypair(), str(Keypair().public_key), 1))
+
+    (_, opts), = spica.solana_client.sent
+    assert opts.last_valid_block_height == 1_000
+
+
+def test_send_many_rejects_duplicate_transfers(spica, monkeypatch):
+    monkeypatch.setattr(spica, "wallets", {})
+    spica.register_wallet("main", Keypair())
+    recipient = str(Keypair().public_key)
+
+    def unexpected_prompt(*args, **kwargs):
+        raise AssertionError("prompted for a batch containing duplicates")
+
+    monkeypatch.setattr(spica.Prompt, "ask", unexpected_prompt)
+
+    asyncio.run(spica.send_many("main", [(recipient, 0.1), (recipient, "0.10")]))
+
+    assert spica.solana_client.sent == []
+
+
+def test_cache_response_starts_flusher_and_writes_off_loop(spica, monkeypatch):
+    monkeypatch.setattr(spica, "CACHE_FLUSH_INTERVAL", 0)
+    monkeypatch.setattr(spica, "cache_flush_task", None)
+
+    async def cache_and_wait():
+        spica.cache_response("prompt", "answer")
+        assert spica.cache_flush_task is not None
+        for _ in range(100):
+            if Path(spica.CACHE_FILE).exists() and Path(spica.CACHE_FILE).read_bytes().endswith(b"\n"):
+                break
+            await asyncio.sleep(0.01)
+        spica.cache_flush_task.cancel()
+
+    asyncio.run(cache_and_wait())
+
+    key, payload, _ = spica.orjson.loads(Path(spica.CACHE_FILE).read_bytes().splitlines()[-1])
+    assert key == spica.cache_key("prompt")
+    assert spica.decompress_response(payload) == "answer"
+
+
+def test_send_many_prompt_total_is_exact(spica, monkeypatch):
+    monkeypatch.setattr(spica, "wallets", {})
+    spica.register_wallet("main", Keypair())
+    prompts = []
+
+    def decline(question, *args, **kwargs):
+        prompts.append(question)
+        return "no"
+
+    monkeypatch.setattr(spica.Prompt, "ask", decline)
+
+    asyncio.run(spica.send_many("main", [(str(Keypair().public_key), 0.1), (str(Keypair().public_key), 0.2)]))
+
+    assert "send 0.3 SOL" in prompts[0]
+
+
+def test_reconnecting_a_saved_wallet_does_not_duplicate_it(spica, monkeypatch):
+    monkeypatch.setattr(spica, "PERSIST_WALLETS", True)
+    monkeypatch.setattr(spica, "wallets", {})
+    monkeypatch.setattr(spica, "saved_wallets", {})
+    private_key = spica.base58.b58encode(bytes(Keypair().secret_key)).decode()
+
+    spica.connect_wallet("main", private_key)
+    spica.connect_wallet("main", private_key)
+
+    assert len(Path(spica.WALLET_FILE).read_bytes().splitlines()) == 1
+
+
+def test_load_saved_wallets_skips_malformed_keys(spica, monkeypatch):
+    monkeypatch.setattr(spica, "wallets", {})
+    monkeypatch.setattr(spica, "saved_wallets", {})
+    keypair = Keypair()
+    spica.save_wallet("good", bytes(keypair.secret_key))
+    with open(spica.WALLET_FILE, "ab") as f:
+        f.write(b"short\t" + spica.encrypt_bytes(b"too short") + b"\n")
+
+    spica.load_saved_wallets()
+
+    assert list(spica.wallets) == ["good"]
+    assert spica.wallets["good"].pubkey == keypair.public_key
+
+
+def test_torn_cache_tail_is_terminated_before_the_next_append(spica):
+    record = spica.orjson.dumps(["kept", spica.compress_response("answer"), spica.time.time()])
+    Path(spica.CACHE_FILE).write_bytes(record + b"\n" + b'["torn", "payl')
+
+    module = importlib.reload(spica)
+    module.cache_response("prompt", "answer")
+    module.flush_cache()
+
+    lines = Path(module.CACHE_FILE).read_bytes().splitlines()
+    assert lines[1] == b'["torn", "payl'
+    assert module.orjson.loads(lines[2])[0] == module.cache_key("prompt")
+
+
+def test_is_rate_limited_matches_wrapped_http_429(spica):
+    import httpx
+    from solana.exceptions import SolanaRpcException
+
+    request = httpx.Request("POST", "https://rpc.example")
+    http_error = httpx.HTTPStatusError("Too Many Requests", request=request, response=httpx.Response(429, request=request))
+    try:
+        raise SolanaRpcException(http_error, None, None, "getBalance") from http_error
+    except SolanaRpcException as wrapped:
+        assert spica.is_rate_limited(wrapped)
+
+    assert not spica.is_rate_limited(spica.RPCException("Account 4290abc not found"))
+
+
+def test_rpc_call_retries_rate_limited_error_bodies(spica, monkeypatch):
+    delays = []
+    sleep = asyncio.sleep
+
+    async def no_backoff(delay):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(spica.asyncio, "sleep", no_backoff)
+    replies = [
+        {"jsonrpc": "2.0", "id": 1, "error": {"code": -32429, "message": "rate limited"}},
+        {"jsonrpc": "2.0", "id": 2, "result": {"value": 5}},
+    ]
+
+    async def get_balance(*args, **kwargs):
+        return replies.pop(0)
+
+    assert asyncio.run(spica.rpc_call(get_balance)) == {"jsonrpc": "2.0", "id": 2, "result": {"value": 5}}
+    assert delays == [0.5]
+
+
+def test_rpc_call_raises_other_error_bodies(spica):
+    calls = []
+
+    async def get_balance(*args, **kwargs):
+        calls.append(args)
+        return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32002, "message": "slot 1429 skipped"}}
+
+    with pytest.raises(spica.RPCException):
+        asyncio.run(spica.rpc_call(get_balance))
+    assert len(calls) == 1
+
+
+def test_balance_batch_survives_a_failing_chunk(spica, monkeypatch):
+    monkeypatch.setattr(spica, "wallets", {})
+    monkeypatch.setattr(spica, "MULTIPLE_ACCOUNTS_CHUNK", 1)
+    spica.register_wallet("ok", Keypair())
+    spica.register_wallet("error", Keypair())
+    spica.register_wallet("broken", Keypair())
+
+    async def get_multiple_accounts(pubkeys, *args, **kwargs):
+        if pubkeys[0] == spica.wallets["error"].pubkey:
+            return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32602, "message": "invalid params"}}
+        if pubkeys[0] == spica.wallets["broken"].pubkey:
+            return {"jsonrpc": "2.0", "id": 1, "result": None}
+        return {"jsonrpc": "2.0", "id": 1, "result": {"value": [{"lamports": 2 * spica.LAMPORTS_PER_SOL}]}}
+
+    monkeypatch.setattr(spica.solana_client, "get_multiple_accounts", get_multiple_accounts, raising=False)
+
+    assert asyncio.run(spica.get_balances_batch(["ok", "error", "broken"])) == {"ok": 2.0}
+
+
+def test_select_rpc_endpoint_skips_fast_error_replies(spica, monkeypatch):
+    class ProbeClient:
+        def __init__(self, url):
+            self.url = url
+            self.closed = False
+
+        async def get_latest_blockhash(self):
+            if self.url == "https://broken.example":
+                return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32603, "message": "internal error"}}
+            await asyncio.sleep(0.01)
+            return {"jsonrpc": "2.0", "id": 1, "result": {"value": {"blockhash": BLOCKHASH, "lastValidBlockHeight": 1}}}
+
+        async def close(self):
+            self.closed = True
+
+    async def close_stub():
+        pass
+
+    monkeypatch.setattr(spica, "AsyncClient", ProbeClient)
+    monkeypatch.setattr(spica.solana_client, "close", close_stub, raising=False)
+    monkeypatch.setattr(spica, "SOLANA_RPC_URL", spica.SOLANA_RPC_URL)
+
+    fastest = asyncio.run(spica.select_rpc_endpoint(["https://broken.example", "https://healthy.example"]))
+
+    assert fastest == "https://healthy.example"
+    assert spica.solana_client.url == "https://healthy.example"
+
+
+class StubHTTPResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status, message="Unauthorized")
+
+    async def json(self, loads=None):
+        return self.body
+
+
+@pytest.mark.parametrize(
+    "status, body, error",
+    [(401, {"message": "missing api key"}, aiohttp.ClientResponseError), (200, {"message": "missing api key"}, ValueError)],
+)
+def test_nft_listing_errors_are_raised(spica, monkeypatch, status, body, error):
+    class StubSession:
+        def get(self, url, params=None):
+            return StubHTTPResponse(status, body)
+
+    async def get_http_session():
+        return StubSession()
+
+    monkeypatch.setattr(spica, "get_http_session", get_http_session)
+
+    with pytest.raises(error):
+        asyncio.run(spica.fetch_nfts(Keypair().public_key))